@@ -8,9 +8,16 @@ import os
 import re
 import time
 import json
+import shutil
+import hashlib
+import threading
+import tempfile
+import random
+import heapq
 import asyncio
 import logging
 import traceback
+from collections import deque, OrderedDict
 from urllib.parse import urlparse, parse_qs, unquote
 from datetime import datetime, timedelta
 
@@ -38,7 +45,7 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 
 # Image processing and OCR
@@ -63,10 +70,123 @@ SHORTENER_DOMAINS = ['cutt.ly', 'fkrt.cc', 'amzn-to.co', 'bitli.in', 'spoo.me',
 PIN_DEFAULT = '110001'
 MAX_RETRIES = 3
 TIMEOUT = 15
+WAIT_TIMEOUT = 10
+MIN_TIMEOUT = 5  # Floor for adaptive page-load timeouts
+MIN_WAIT_TIMEOUT = 3  # Floor for adaptive element waits
+LATENCY_WINDOW = 50  # Page-load samples kept per domain
+RETRY_BACKOFF_BASE = 1.0  # Seconds, doubled on every retry
+RETRY_BACKOFF_MAX = 8.0
+CIRCUIT_FAILURE_THRESHOLD = 3  # Consecutive failed requests (after retries) before the circuit opens
+CIRCUIT_COOLDOWN = 60  # Seconds before an open circuit lets a probe through
+CIRCUIT_FALLBACK_TEXT = True  # Send a text-only post while a circuit is open
+FALLBACK_TIMEOUT = 5
+SEND_CHAT_RATE = 1.0  # Messages per second to a single chat
+SEND_CHAT_BURST = 3
+SEND_GLOBAL_RATE = 30.0  # Messages per second across all chats
+SEND_GLOBAL_BURST = 30
+TELEGRAM_TEXT_LIMIT = 4096
+FLOOD_GLOBAL_WINDOW = 10  # Seconds; 429s from several chats within this window pause all sends
+PRIORITY_INTERACTIVE = 0  # Error replies and command feedback
+PRIORITY_POST = 1  # Formatted product posts
 WATERMARK_THRESHOLD = 0.85  # Confidence threshold for watermark detection
-MODE_ADVANCED = False
+WATERMARK_CACHE_SIZE = 512  # Watermark verdicts kept for near-duplicate screenshots
+WATERMARK_HASH_SIZE = 16  # dHash grid, giving a 256-bit hash
+WATERMARK_HASH_DISTANCE = 10  # Max Hamming distance (of 256 bits) to reuse a verdict
 LAST_PROCESSED = {}
+# Pipeline stages each processing profile runs
+PROCESSING_PROFILES = {
+    'fast': {
+        'fast_path': True,  # HTTP metadata extraction only, no browser
+        'screenshot': False,
+        'reviews': False,
+        'ocr': False,
+        'stock_check': False
+    },
+    'medium': {
+        'fast_path': False,
+        'screenshot': True,
+        'reviews': False,
+        'ocr': False,
+        'stock_check': False
+    },
+    'advanced': {
+        'fast_path': False,
+        'screenshot': True,
+        'reviews': True,
+        'ocr': True,
+        'stock_check': True
+    }
+}
+DEFAULT_PROFILE = 'medium'
+CHAT_PROFILES = {}  # chat_id -> profile name
+# Buy-box locators for the stock check; page-wide text also matches single sizes and other sellers
+_UPPER = "translate(normalize-space(.), 'abcdefghijklmnopqrstuvwxyz', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ')"
+STOCK_LOCATORS = {
+    'amazon': {
+        'in_stock': (By.CSS_SELECTOR, '#add-to-cart-button, #buy-now-button'),
+        'out_of_stock': (By.CSS_SELECTOR, '#outOfStock')
+    },
+    'flipkart': {
+        'in_stock': (By.XPATH, f"//button[contains({_UPPER}, 'ADD TO CART') or contains({_UPPER}, 'BUY NOW')]"),
+        'out_of_stock': (By.XPATH, f"//button[contains({_UPPER}, 'NOTIFY ME')]")
+    },
+    'meesho': {
+        'in_stock': (By.XPATH, f"//button[contains({_UPPER}, 'ADD TO CART') or contains({_UPPER}, 'BUY NOW')]"),
+        'out_of_stock': (By.XPATH, f"//button[contains({_UPPER}, 'OUT OF STOCK') or contains({_UPPER}, 'SOLD OUT')]")
+    },
+    'myntra': {
+        'in_stock': (By.CSS_SELECTOR, '.pdp-add-to-bag'),
+        'out_of_stock': (By.CSS_SELECTOR, '.pdp-out-of-stock')
+    }
+}
 SCREENSHOT_DIR = "screenshots"
+BROWSER_PROFILE_DIR = "browser_profiles"
+BROWSER_POOL_SIZE = 2  # Idle warm sessions kept per platform
+BROWSER_CACHE_SIZE = 100 * 1024 * 1024  # Disk cache per profile, in bytes
+BROWSER_COOKIE_TTL = 365 * 24 * 3600  # Lifetime of pre-set cookies, in seconds
+BENCH_RUNS = 3
+# Cookies and localStorage pre-set in every session ({pin} is the delivery pincode).
+# Amazon keeps the delivery location server-side, so it has no pincode preset.
+PLATFORM_PRESETS = {
+    'meesho': {
+        'origin': 'https://www.meesho.com',
+        'cookie_domain': '.meesho.com',
+        'cookies': {'pincode': '{pin}'},
+        'local_storage': {'pincode': '{pin}', 'isPincodeSelected': 'true'}
+    },
+    'flipkart': {
+        'origin': 'https://www.flipkart.com',
+        'cookie_domain': '.flipkart.com',
+        'cookies': {'pincode': '{pin}'},
+        'local_storage': {'pincode': '{pin}'}
+    },
+    'amazon': {
+        'origin': 'https://www.amazon.in',
+        'cookie_domain': '.amazon.in',
+        'cookies': {'i18n-prefs': 'INR', 'lc-acbin': 'en_IN'},
+        'local_storage': {}
+    },
+    'myntra': {
+        'origin': 'https://www.myntra.com',
+        'cookie_domain': '.myntra.com',
+        'cookies': {'mynt-pincode': '{pin}'},
+        'local_storage': {'pincode': '{pin}'}
+    }
+}
+SCREENSHOT_FORMAT = 'JPEG'  # 'JPEG' or 'WEBP'
+SCREENSHOT_QUALITY = 85  # Starting encoder quality
+SCREENSHOT_MIN_QUALITY = 40  # Lowest quality tried before giving up on the size budget
+SCREENSHOT_MAX_BYTES = 150 * 1024  # Size budget per encoded screenshot
+SCREENSHOT_MAX_EDGE = 2560  # Telegram downsizes photos beyond this anyway
+SCREENSHOT_MIN_EDGE = 480  # Smallest long edge to shrink to when chasing the budget
+PRODUCT_CARD_SELECTORS = {
+    'meesho_product': (By.CSS_SELECTOR, '.pdp-product-details'),
+    # The element holding all review cards, not just the first card
+    'meesho_reviews': (By.XPATH, "(//*[contains(concat(' ', normalize-space(@class), ' '), ' review-card ')])[1]/.."),
+    'myntra_product': (By.CSS_SELECTOR, '.pdp-details'),
+    'amazon_product': (By.CSS_SELECTOR, '#ppd'),
+    'flipkart_product': (By.CSS_SELECTOR, '.DOjaWF')
+}
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
 
 # Initialize logger
@@ -79,14 +199,603 @@ logger = logging.getLogger(__name__)
 # Initialize OCR reader
 reader = easyocr.Reader(['en'])
 
+class PageLoadError(Exception):
+    """A page failed to load or render in time; worth retrying, unlike a missing element"""
+
+
+class DomainHealth:
+    """Per-domain latency tracker with adaptive timeouts and a circuit breaker"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, domain):
+        """Start with an empty latency window and a closed circuit"""
+        self.domain = domain
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.escalated = False  # Use the full limits after a timeout until a load succeeds
+        self.lock = threading.RLock()  # Scrapes report from worker threads
+    
+    def _percentile(self, pct):
+        """Return the given latency percentile, or None without samples"""
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+            index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+            return ordered[index]
+    
+    def page_load_timeout(self):
+        """Page-load timeout derived from the observed p95 latency"""
+        with self.lock:
+            p95 = self._percentile(95)
+            if p95 is None or self.escalated:
+                return TIMEOUT
+            return max(MIN_TIMEOUT, min(TIMEOUT, p95 * 2))
+    
+    def wait_timeout(self):
+        """Element wait timeout derived from the observed p90 latency"""
+        with self.lock:
+            p90 = self._percentile(90)
+            if p90 is None or self.escalated:
+                return WAIT_TIMEOUT
+            return max(MIN_WAIT_TIMEOUT, min(WAIT_TIMEOUT, p90 * 1.5))
+    
+    def allow_request(self):
+        """Check whether a request may go out, moving to half-open after the cooldown"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < CIRCUIT_COOLDOWN:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+                logger.info(f"Circuit half-open for {self.domain}, probing")
+            # Half-open: let exactly one probe through
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+    
+    def record_success(self, latency):
+        """Record a successful page load and close the circuit"""
+        with self.lock:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            self.escalated = False
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit closed for {self.domain}")
+            self.state = self.CLOSED
+    
+    def record_timeout(self, elapsed):
+        """Record a timed-out load as a sample at its limit so the timeouts can grow again"""
+        with self.lock:
+            self.latencies.append(elapsed)
+            self.escalated = True
+    
+    def record_failure(self):
+        """Record a failed request and open the circuit when it keeps failing"""
+        with self.lock:
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened for {self.domain} after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+class WatermarkCache:
+    """LRU cache of watermark verdicts keyed by screenshot kind and a perceptual dHash"""
+    
+    def __init__(self, max_size=WATERMARK_CACHE_SIZE, max_distance=WATERMARK_HASH_DISTANCE):
+        """Start with an empty cache and zeroed hit counters"""
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.entries = OrderedDict()  # (prefix, hash) -> verdict
+        self.hits = 0
+        self.misses = 0
+        self.ocr_runs = 0
+        self.ocr_seconds = 0.0
+        self.lock = threading.Lock()  # Scrapes check watermarks from worker threads
+    
+    @staticmethod
+    def dhash(image_path, hash_size=WATERMARK_HASH_SIZE):
+        """Compute a hash_size x hash_size bit difference hash over a downscaled grayscale image"""
+        with Image.open(image_path) as image:
+            pixels = np.asarray(
+                image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS),
+                dtype=np.int16
+            )
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int(''.join('1' if bit else '0' for bit in bits), 2)
+    
+    def get(self, prefix, image_hash):
+        """Return the verdict of the closest cached hash of the same kind within range, or None"""
+        with self.lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for key in self.entries:
+                if key[0] != prefix:
+                    continue
+                distance = bin(key[1] ^ image_hash).count('1')
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key]
+    
+    def put(self, prefix, image_hash, verdict, ocr_seconds):
+        """Store a verdict, evicting the least recently used entry when full"""
+        with self.lock:
+            self.ocr_runs += 1
+            self.ocr_seconds += ocr_seconds
+            key = (prefix, image_hash)
+            self.entries[key] = verdict
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def format_stats(self):
+        """Summarise hit rate and the OCR time saved by cache hits"""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return "No watermark checks yet"
+        hit_rate = self.hits / lookups * 100
+        line = f"• {self.hits}/{lookups} hits ({hit_rate:.0f}%), {len(self.entries)} cached"
+        if self.ocr_runs:
+            saved = self.hits * self.ocr_seconds / self.ocr_runs
+            line += f", ~{saved:.1f}s OCR saved"
+        return line
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+    
+    def __init__(self, rate, capacity):
+        """Start with a full bucket"""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+    
+    def _refill(self, now):
+        """Add the tokens accrued since the last update (nothing accrues while blocked)"""
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self, now, count=1):
+        """Seconds until count tokens are available (0 if they are available now)"""
+        self._refill(now)
+        # A cost above the burst size waits for a full bucket and then goes into debt
+        needed = min(count, self.capacity)
+        wait = 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+    
+    def consume(self, now, count=1):
+        """Take count tokens"""
+        self._refill(now)
+        self.tokens -= count
+    
+    def block(self, seconds):
+        """Hold the bucket for the flood-control period, with one token ready when it ends"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        # Refill resumes only once the block ends, so no burst right after a 429
+        self.tokens = min(1, self.capacity)
+        self.updated = self.blocked_until
+
+
+class SendScheduler:
+    """Outbound Telegram send queue paced by per-chat and global token buckets"""
+    
+    def __init__(self):
+        """Create an empty queue; the worker starts on the first send"""
+        self.pending = []  # heap of (priority, seq, job)
+        self.seq = 0
+        self.chat_buckets = {}
+        self.global_bucket = TokenBucket(SEND_GLOBAL_RATE, SEND_GLOBAL_BURST)
+        self.in_flight = set()  # chats with a send in progress, to keep per-chat order
+        self.tasks = set()  # running sends, referenced so they aren't garbage-collected
+        self.flood_chats = {}  # chat_id -> time of its last 429
+        self.wakeup = None
+        self.worker = None
+    
+    async def send_text(self, message, text, priority=PRIORITY_INTERACTIVE):
+        """Queue a text reply to a message"""
+        return await self._submit(message, 'text', priority, text=text)
+    
+    async def send_photo(self, message, path, caption, priority=PRIORITY_POST, on_sent=None):
+        """Queue a photo reply to a message"""
+        return await self._submit(message, 'photo', priority, paths=[path], text=caption, on_sent=on_sent)
+    
+    async def send_media_group(self, message, paths, caption, priority=PRIORITY_POST, on_sent=None):
+        """Queue a media group reply with the caption on the first photo"""
+        return await self._submit(message, 'media_group', priority, paths=paths, text=caption, on_sent=on_sent)
+    
+    async def _submit(self, message, kind, priority, text=None, paths=None, on_sent=None):
+        """Add a job to the queue and wait until it has been sent"""
+        if self.worker is None or self.worker.done():
+            self.wakeup = asyncio.Event()
+            self.worker = asyncio.create_task(self._run())
+        
+        job = {
+            'chat_id': message.chat_id,
+            'kind': kind,
+            'message': message,
+            'text': text,
+            'paths': paths or [],
+            'on_sent': on_sent,
+            'future': asyncio.get_running_loop().create_future()
+        }
+        self.seq += 1
+        heapq.heappush(self.pending, (priority, self.seq, job))
+        self.wakeup.set()
+        return await job['future']
+    
+    def _chat_bucket(self, chat_id):
+        """Return the token bucket for a chat, creating it on first use"""
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(SEND_CHAT_RATE, SEND_CHAT_BURST)
+        return self.chat_buckets[chat_id]
+    
+    async def _run(self):
+        """Dispatch the highest-priority job whose chat is ready, respecting both buckets"""
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            
+            now = time.monotonic()
+            chosen = None
+            wait = None
+            for entry in sorted(self.pending):
+                chat_id = entry[2]['chat_id']
+                if chat_id in self.in_flight:
+                    continue
+                cost = self._cost(entry[2])
+                job_wait = max(self.global_bucket.delay(now, cost), self._chat_bucket(chat_id).delay(now, cost))
+                if job_wait <= 0:
+                    chosen = entry
+                    break
+                wait = job_wait if wait is None else min(wait, job_wait)
+            
+            if chosen is None:
+                # Sleep until a bucket refills or a new job arrives
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self.pending.remove(chosen)
+            jobs = [chosen] + self._merge_texts(chosen)
+            heapq.heapify(self.pending)
+            
+            chat_id = chosen[2]['chat_id']
+            cost = self._cost(chosen[2])
+            self.global_bucket.consume(now, cost)
+            self._chat_bucket(chat_id).consume(now, cost)
+            self.in_flight.add(chat_id)
+            task = asyncio.create_task(self._execute(jobs))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    def _cost(self, job):
+        """Telegram counts every photo of a media group as a message"""
+        if job['kind'] == 'media_group':
+            return len(job['paths'])
+        return 1
+    
+    def _merge_texts(self, chosen):
+        """Pull later text jobs for the same chat that directly follow the chosen one"""
+        job = chosen[2]
+        if job['kind'] != 'text':
+            return []
+        
+        merged = []
+        length = len(job['text'])
+        following = sorted(
+            (entry for entry in self.pending if entry[2]['chat_id'] == job['chat_id'] and entry[1] > chosen[1]),
+            key=lambda entry: entry[1]
+        )
+        for entry in following:
+            if entry[2]['kind'] != 'text':
+                break
+            length += len(entry[2]['text']) + 2
+            if length > TELEGRAM_TEXT_LIMIT:
+                break
+            merged.append(entry)
+        
+        for entry in merged:
+            self.pending.remove(entry)
+        return merged
+    
+    async def _execute(self, entries):
+        """Send a job (or merged text jobs) and requeue it if Telegram asks us to wait"""
+        head = entries[0][2]
+        chat_id = head['chat_id']
+        try:
+            start = time.monotonic()
+            result = await self._send(head, [entry[2] for entry in entries])
+            elapsed = time.monotonic() - start
+            for entry in entries:
+                if not entry[2]['future'].done():
+                    entry[2]['future'].set_result(result)
+            
+            # The post is delivered; a stats callback error must not turn it into a failure
+            if head['on_sent']:
+                try:
+                    head['on_sent'](elapsed)
+                except Exception as e:
+                    logger.warning(f"Send callback failed: {str(e)}")
+        except telegram.error.RetryAfter as e:
+            logger.warning(f"Flood control for chat {chat_id}, retrying in {e.retry_after}s")
+            self._chat_bucket(chat_id).block(e.retry_after)
+            
+            # 429s from several chats at once point at the bot-wide limit
+            now = time.monotonic()
+            self.flood_chats[chat_id] = now
+            self.flood_chats = {
+                chat: at for chat, at in self.flood_chats.items() if now - at <= FLOOD_GLOBAL_WINDOW
+            }
+            if len(self.flood_chats) > 1:
+                logger.warning(f"Flood control in {len(self.flood_chats)} chats, pausing all sends")
+                self.global_bucket.block(e.retry_after)
+            for entry in entries:
+                heapq.heappush(self.pending, entry)
+        except Exception as e:
+            for entry in entries:
+                if not entry[2]['future'].done():
+                    entry[2]['future'].set_exception(e)
+        finally:
+            self.in_flight.discard(chat_id)
+            self.wakeup.set()
+    
+    async def _send(self, head, jobs):
+        """Perform the Telegram API call for a job"""
+        message = head['message']
+        if head['kind'] == 'text':
+            text = "\n\n".join(job['text'] for job in jobs)
+            if all(job['message'].message_id == message.message_id for job in jobs):
+                return await message.reply_text(text)
+            # Replies to different messages can't share one thread, so merge into a plain message
+            return await message.get_bot().send_message(chat_id=head['chat_id'], text=text)
+        
+        files = [open(path, 'rb') for path in head['paths']]
+        try:
+            if head['kind'] == 'photo':
+                return await message.reply_photo(photo=files[0], caption=head['text'])
+            media = [InputMediaPhoto(files[0], caption=head['text'])]
+            media += [InputMediaPhoto(f) for f in files[1:]]
+            return await message.reply_media_group(media=media)
+        finally:
+            for f in files:
+                f.close()
+
+
+class BrowserPool:
+    """Pool of Chrome sessions cloned from persistent per-platform profile snapshots"""
+    
+    def __init__(self, options_factory):
+        """Start with no idle sessions; templates are snapshotted on first use"""
+        self.options_factory = options_factory
+        self.idle = {}  # platform -> [driver]
+        self.profile_dirs = {}  # session_id -> cloned user-data dir
+        self.preset_scripts = {}  # session_id -> injected localStorage script id
+        self.driver_path = None
+        self.snapshot_lock = threading.Lock()  # Scrapes and /bench build snapshots from worker threads
+        self.idle_lock = threading.Lock()
+        
+        # Clones left behind by an earlier process are never reused
+        self.sessions_dir = os.path.join(BROWSER_PROFILE_DIR, 'sessions')
+        shutil.rmtree(self.sessions_dir, ignore_errors=True)
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        
+        # Snapshots are built in hidden dirs and renamed into place when done,
+        # so a leftover hidden dir is from a build that was interrupted
+        self.templates_dir = os.path.join(BROWSER_PROFILE_DIR, 'templates')
+        os.makedirs(self.templates_dir, exist_ok=True)
+        for name in os.listdir(self.templates_dir):
+            if name.startswith('.'):
+                shutil.rmtree(os.path.join(self.templates_dir, name), ignore_errors=True)
+    
+    def start_driver(self, user_data_dir):
+        """Start Chrome on the given user-data dir"""
+        if self.driver_path is None:
+            self.driver_path = ChromeDriverManager().install()
+        
+        options = self.options_factory()
+        options.add_argument(f'--user-data-dir={os.path.abspath(user_data_dir)}')
+        options.add_argument(f'--disk-cache-size={BROWSER_CACHE_SIZE}')
+        # Deny location permission up front so sites skip the prompt
+        options.add_experimental_option('prefs', {'profile.default_content_setting_values.geolocation': 2})
+        driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        self.profile_dirs[driver.session_id] = user_data_dir
+        return driver
+    
+    def _template_dir(self, platform):
+        """Path of the persistent profile snapshot for a platform's current presets"""
+        # Versioned by the presets, so changing them in code builds a fresh snapshot
+        preset = json.dumps(PLATFORM_PRESETS.get(platform), sort_keys=True)
+        version = hashlib.sha1(preset.encode()).hexdigest()[:8]
+        return os.path.join(self.templates_dir, f"{platform}-{version}")
+    
+    def snapshot(self, platform):
+        """Build the platform's profile snapshot with presets applied and the cache warmed"""
+        with self.snapshot_lock:
+            return self._build_snapshot(platform)
+    
+    def _build_snapshot(self, platform):
+        """Create the snapshot directory unless a finished one already exists"""
+        template_dir = self._template_dir(platform)
+        if os.path.isdir(template_dir):
+            return template_dir
+        
+        logger.info(f"Creating browser profile snapshot for {platform}")
+        build_dir = tempfile.mkdtemp(prefix=f".{platform}-", dir=self.templates_dir)
+        try:
+            driver = self.start_driver(build_dir)
+        except Exception:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        try:
+            driver.set_page_load_timeout(TIMEOUT)
+            self.apply_presets(driver, platform, PIN_DEFAULT)
+            preset = PLATFORM_PRESETS.get(platform)
+            if preset:
+                driver.get(preset['origin'])
+        except Exception as e:
+            logger.warning(f"Could not warm {platform} profile: {str(e)}")
+        finally:
+            self.profile_dirs.pop(driver.session_id, None)
+            self.preset_scripts.pop(driver.session_id, None)
+            try:
+                driver.quit()
+            except:
+                pass
+        
+        # Drop snapshots built for older presets, then publish the new one
+        for name in os.listdir(self.templates_dir):
+            if name.startswith(f"{platform}-"):
+                shutil.rmtree(os.path.join(self.templates_dir, name), ignore_errors=True)
+        os.replace(build_dir, template_dir)
+        return template_dir
+    
+    def clone(self, platform):
+        """Start a fresh session on a new copy of the platform's profile snapshot"""
+        # Chrome locks its user-data dir, so every live session gets its own clone
+        clone_dir = tempfile.mkdtemp(prefix=f"{platform}_", dir=self.sessions_dir)
+        try:
+            shutil.copytree(
+                self.snapshot(platform),
+                clone_dir,
+                ignore=shutil.ignore_patterns('Singleton*', 'lockfile'),
+                dirs_exist_ok=True
+            )
+            return self.start_driver(clone_dir)
+        except Exception:
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            raise
+    
+    def acquire(self, platform, pin_code=PIN_DEFAULT):
+        """Return a warm session for the platform with its presets (and pincode, where kept client-side) applied"""
+        with self.idle_lock:
+            idle = self.idle.get(platform)
+            driver = idle.pop() if idle else None
+        if driver is None:
+            driver = self.clone(platform)
+        
+        self.apply_presets(driver, platform, pin_code)
+        return driver
+    
+    def release(self, platform, driver):
+        """Return a session to the pool, or close it if the pool is full or it is broken"""
+        try:
+            script_id = self.preset_scripts.pop(driver.session_id, None)
+            if script_id:
+                driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': script_id})
+            driver.get('about:blank')
+        except Exception as e:
+            logger.warning(f"Discarding broken {platform} session: {str(e)}")
+            self.discard(driver)
+            return
+        
+        with self.idle_lock:
+            idle = self.idle.setdefault(platform, [])
+            pooled = len(idle) < BROWSER_POOL_SIZE
+            if pooled:
+                idle.append(driver)
+        if not pooled:
+            self.discard(driver)
+    
+    def discard(self, driver):
+        """Quit a session and delete its cloned profile"""
+        self.preset_scripts.pop(driver.session_id, None)
+        profile_dir = self.profile_dirs.pop(driver.session_id, None)
+        try:
+            driver.quit()
+        except:
+            pass
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+    
+    def close(self):
+        """Close every idle session"""
+        with self.idle_lock:
+            idle, self.idle = self.idle, {}
+        for drivers in idle.values():
+            for driver in drivers:
+                self.discard(driver)
+    
+    def apply_presets(self, driver, platform, pin_code):
+        """Set the platform's cookies and localStorage before any page script runs"""
+        preset = PLATFORM_PRESETS.get(platform)
+        if not preset:
+            return
+        
+        try:
+            for name, value in preset['cookies'].items():
+                driver.execute_cdp_cmd('Network.setCookie', {
+                    'name': name,
+                    'value': value.format(pin=pin_code),
+                    'domain': preset['cookie_domain'],
+                    'path': '/',
+                    # Persistent cookies, so they are written into the profile snapshot
+                    'expires': time.time() + BROWSER_COOKIE_TTL
+                })
+            
+            if preset['local_storage']:
+                # Injected per document so the first real load needs no extra round-trip
+                items = "".join(
+                    f"localStorage.setItem({json.dumps(key)}, {json.dumps(value.format(pin=pin_code))});"
+                    for key, value in preset['local_storage'].items()
+                )
+                script = f"if (location.hostname.endsWith({json.dumps(preset['cookie_domain'])})) {{ try {{ {items} }} catch (e) {{}} }}"
+                result = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': script})
+                self.preset_scripts[driver.session_id] = result.get('identifier')
+        except Exception as e:
+            logger.warning(f"Could not apply {platform} presets: {str(e)}")
+
+
 class BotProcessor:
     """Main processor for handling product links and generating formatted messages"""
     
     def __init__(self):
         """Initialize the processor with necessary tools"""
         self.unshortener = UnshortenIt()
-        self.chrome_options = self._setup_chrome_options()
         self.last_screenshot = None
+        self.domain_health = {}
+        self.screenshot_stats = {}
+        self.state_lock = threading.Lock()  # Scrapes update shared state from worker threads
+        self.watermark_cache = WatermarkCache()
+        self.send_scheduler = SendScheduler()
+        self.browser_pool = BrowserPool(self._setup_chrome_options)
+    
+    def get_health(self, domain):
+        """Return the health tracker for a domain, creating it on first use"""
+        with self.state_lock:
+            if domain not in self.domain_health:
+                self.domain_health[domain] = DomainHealth(domain)
+            return self.domain_health[domain]
     
     def _setup_chrome_options(self):
         """Configure Chrome options for mobile emulation"""
@@ -104,7 +813,6 @@ class BotProcessor:
     
     async def process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process incoming messages for product links"""
-        global MODE_ADVANCED
         message = update.effective_message
         chat_id = update.effective_chat.id
         
@@ -140,7 +848,7 @@ class BotProcessor:
             except Exception as e:
                 logger.error(f"Error processing link {link}: {str(e)}")
                 logger.error(traceback.format_exc())
-                await message.reply_text(f"❌ Error processing link: {str(e)}")
+                await self.send_scheduler.send_text(message, f"❌ Error processing link: {str(e)}")
     
     async def process_link(self, link, update):
         """Main link processing pipeline"""
@@ -167,23 +875,116 @@ class BotProcessor:
             return None
         
         # Step 4: Scrape platform-specific data
+        if 'meesho.com' in domain:
+            scraper = self.scrape_meesho
+        elif 'myntra.com' in domain:
+            scraper = self.scrape_myntra
+        elif 'amazon.in' in domain:
+            scraper = self.scrape_amazon
+        elif 'flipkart.com' in domain:
+            scraper = self.scrape_flipkart
+        # Add other platform scrapers here...
+        else:
+            logger.warning(f"No scraper implemented for domain: {domain}")
+            return None
+        
+        return await self._scrape_with_retries(scraper, domain, clean_url, update)
+    
+    async def _scrape_with_retries(self, scraper, domain, url, update):
+        """Run a scraper, retrying page-load failures with jitter and failing fast while the circuit is open"""
+        # Fast profile skips the browser entirely
+        if get_profile(update.effective_chat.id)['fast_path']:
+            result = await self._fast_path_extract(url, domain, update)
+            if not result:
+                raise Exception("Could not read product details from the page")
+            return result
+        
+        health = self.get_health(domain)
+        if not health.allow_request():
+            logger.warning(f"Circuit open for {domain}, skipping browser load")
+            if CIRCUIT_FALLBACK_TEXT:
+                return await self._fast_path_extract(url, domain, update)
+            return None
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                # None means the page loaded but extraction failed; reloading won't help.
+                # Selenium and OCR block, so run them off the event loop
+                return await asyncio.to_thread(scraper, url, update)
+            except PageLoadError as e:
+                logger.warning(f"Page load failed for {url}: {str(e)}")
+            
+            if attempt < MAX_RETRIES - 1:
+                delay = health.backoff_delay(attempt)
+                logger.info(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 2}/{MAX_RETRIES})")
+                await asyncio.sleep(delay)
+        
+        # One failure per request, so a single dead link can't open the circuit by itself
+        health.record_failure()
+        if health.state == DomainHealth.OPEN and CIRCUIT_FALLBACK_TEXT:
+            return await self._fast_path_extract(url, domain, update)
+        return None
+    
+    async def _fast_path_extract(self, url, domain, update):
+        """Build a text-only post from the page metadata without starting a browser"""
         try:
-            if 'meesho.com' in domain:
-                return await self.scrape_meesho(clean_url, update)
-            elif 'myntra.com' in domain:
-                return await self.scrape_myntra(clean_url, update)
-            elif 'amazon.in' in domain:
-                return await self.scrape_amazon(clean_url, update)
-            elif 'flipkart.com' in domain:
-                return await self.scrape_flipkart(clean_url, update)
-            # Add other platform scrapers here...
-            else:
-                logger.warning(f"No scraper implemented for domain: {domain}")
-                return None
+            # Fetch off the event loop so other chats and the send queue keep running
+            response = await asyncio.to_thread(
+                requests.get,
+                url,
+                headers={'User-Agent': 'Mozilla/5.0'},
+                timeout=FALLBACK_TIMEOUT
+            )
+            soup = BeautifulSoup(response.text, 'lxml')
         except Exception as e:
-            logger.error(f"Scraping error for {clean_url}: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.warning(f"Text-only fallback failed for {url}: {str(e)}")
             return None
+        
+        title_tag = soup.find('meta', property='og:title')
+        title = title_tag.get('content', '') if title_tag else (soup.title.string if soup.title else '')
+        if not title:
+            return None
+        price_tag = soup.find('meta', property='product:price:amount')
+        price = price_tag.get('content', '') if price_tag else ''
+        
+        platform = self.get_platform(domain)
+        is_clothing = platform in ('meesho', 'myntra')
+        return {
+            'platform': platform,
+            'title': self.clean_title(title.strip(), is_clothing=is_clothing),
+            'price': self.parse_price(price),
+            'sizes': [],
+            'pin': self.get_pin_code(update),
+            'images': [],
+            'url': url,
+            'is_clothing': is_clothing
+        }
+    
+    def get_pin_code(self, update):
+        """Get pin code from message if available"""
+        message = update.effective_message
+        pin_match = re.search(r'pin\s*[:\-]?\s*(\d{6})', message.text or message.caption or "", re.IGNORECASE)
+        if pin_match:
+            return pin_match.group(1)
+        return PIN_DEFAULT
+    
+    def _load_page(self, driver, url, locator):
+        """Load a page with adaptive timeouts and record its latency for the domain"""
+        health = self.get_health(self.get_domain(url))
+        driver.set_page_load_timeout(health.page_load_timeout())
+        
+        start = time.monotonic()
+        try:
+            driver.get(url)
+            WebDriverWait(driver, health.wait_timeout()).until(
+                EC.presence_of_element_located(locator)
+            )
+        except TimeoutException as e:
+            health.record_timeout(time.monotonic() - start)
+            raise PageLoadError(f"Timed out loading {url}") from e
+        except WebDriverException as e:
+            raise PageLoadError(f"Could not load {url}: {e.msg}") from e
+        health.record_success(time.monotonic() - start)
     
     async def unshorten_url(self, url):
         """Unshorten URL using multiple methods"""
@@ -244,31 +1045,24 @@ class BotProcessor:
         parsed = urlparse(url)
         return parsed.netloc.lower().split(':')[0]
     
-    async def scrape_meesho(self, url, update):
+    def get_platform(self, domain):
+        """Map a domain to its platform name"""
+        return next((name for name, value in SUPPORTED_DOMAINS.items() if value in domain), domain)
+    
+    def scrape_meesho(self, url, update):
         """Scrape Meesho product details with screenshots"""
         logger.info(f"Scraping Meesho product: {url}")
         
         # Get pin code from message if available
-        pin_code = PIN_DEFAULT
-        message = update.effective_message
-        pin_match = re.search(r'pin\s*[:\-]?\s*(\d{6})', message.text or message.caption or "", re.IGNORECASE)
-        if pin_match:
-            pin_code = pin_match.group(1)
+        pin_code = self.get_pin_code(update)
         
         # Set up WebDriver
         driver = None
         try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=self.chrome_options
-            )
-            driver.set_page_load_timeout(TIMEOUT)
+            driver = self.browser_pool.acquire('meesho', pin_code)
             
             # Load product page
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, '.pdp-product-title'))
-            )
+            self._load_page(driver, url, (By.CSS_SELECTOR, '.pdp-product-title'))
             
             # Extract product details
             title_element = driver.find_element(By.CSS_SELECTOR, '.pdp-product-title')
@@ -292,15 +1086,19 @@ class BotProcessor:
             # Determine size display
             size_display = "All" if not available_sizes else ", ".join(available_sizes)
             
-            # Capture screenshots
-            product_screenshot = self.capture_screenshot(driver, "meesho_product")
-            review_screenshot = self._capture_meesho_reviews(driver, url)
+            # Run the stages enabled for this chat
+            profile = get_profile(update.effective_chat.id)
+            in_stock = self.check_stock(driver, 'meesho') if profile['stock_check'] else None
+            images = self._capture_product_images(driver, "meesho_product", profile)
             
-            # Check for watermarks and replace if needed
-            if self.detect_watermark(product_screenshot) or self.detect_watermark(review_screenshot):
-                logger.info("Watermark detected, refreshing screenshots")
-                product_screenshot = self.capture_screenshot(driver, "meesho_product")
+            # Reviews navigate away from the product page, so they come last
+            if images and profile['reviews']:
                 review_screenshot = self._capture_meesho_reviews(driver, url)
+                if review_screenshot and profile['ocr'] and self.detect_watermark(review_screenshot, "meesho_reviews"):
+                    logger.info("Watermark detected, refreshing reviews screenshot")
+                    review_screenshot = self.capture_screenshot(driver, "meesho_reviews")
+                if review_screenshot:
+                    images.append(review_screenshot)
             
             # Return structured data
             return {
@@ -309,53 +1107,69 @@ class BotProcessor:
                 'price': price_value,
                 'sizes': available_sizes,
                 'pin': pin_code,
-                'images': [product_screenshot, review_screenshot],
+                'images': images,
+                'in_stock': in_stock,
                 'url': url,
                 'is_clothing': True
             }
             
+        except PageLoadError:
+            # Let the retry loop handle transient load failures
+            raise
         except Exception as e:
             logger.error(f"Meesho scraping error: {str(e)}")
             logger.error(traceback.format_exc())
             return None
         finally:
             if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
+                self.browser_pool.release('meesho', driver)
+    
+    def _capture_product_images(self, driver, prefix, profile):
+        """Capture the product screenshot, re-taking it if OCR finds a watermark"""
+        if not profile['screenshot']:
+            return []
+        
+        screenshot = self.capture_screenshot(driver, prefix)
+        if profile['ocr'] and self.detect_watermark(screenshot, prefix):
+            logger.info("Watermark detected, refreshing screenshot")
+            screenshot = self.capture_screenshot(driver, prefix)
+        return [screenshot]
+    
+    def check_stock(self, driver, platform):
+        """Check the platform's buy box; None when neither state can be confirmed"""
+        locators = STOCK_LOCATORS.get(platform)
+        if not locators:
+            return None
+        try:
+            if any(e.is_displayed() for e in driver.find_elements(*locators['out_of_stock'])):
+                return False
+            if any(e.is_displayed() for e in driver.find_elements(*locators['in_stock'])):
+                return True
+        except Exception as e:
+            logger.warning(f"Stock check failed: {str(e)}")
+        return None
     
     def _capture_meesho_reviews(self, driver, product_url):
         """Capture Meesho reviews page screenshot"""
         try:
             # Navigate to reviews page
             reviews_url = f"{product_url}/reviews"
-            driver.get(reviews_url)
-            WebDriverWait(driver, 8).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, '.review-card'))
-            )
+            self._load_page(driver, reviews_url, (By.CSS_SELECTOR, '.review-card'))
             return self.capture_screenshot(driver, "meesho_reviews")
         except Exception as e:
             logger.warning(f"Could not capture reviews screenshot: {str(e)}")
             return None
     
-    async def scrape_myntra(self, url, update):
+    def scrape_myntra(self, url, update):
         """Scrape Myntra product details"""
         logger.info(f"Scraping Myntra product: {url}")
         
         driver = None
         try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=self.chrome_options
-            )
-            driver.set_page_load_timeout(TIMEOUT)
+            driver = self.browser_pool.acquire('myntra', self.get_pin_code(update))
             
             # Load product page
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.product-title'))
-            )
+            self._load_page(driver, url, (By.CSS_SELECTOR, 'h1.product-title'))
             
             # Extract product details
             title_element = driver.find_element(By.CSS_SELECTOR, 'h1.product-title')
@@ -376,13 +1190,10 @@ class BotProcessor:
                 if "disabled" not in size_element.get_attribute("class"):
                     available_sizes.append(size_element.text.strip())
             
-            # Capture screenshot
-            screenshot = self.capture_screenshot(driver, "myntra_product")
-            
-            # Check for watermarks
-            if self.detect_watermark(screenshot):
-                logger.info("Watermark detected, refreshing screenshot")
-                screenshot = self.capture_screenshot(driver, "myntra_product")
+            # Run the stages enabled for this chat
+            profile = get_profile(update.effective_chat.id)
+            in_stock = self.check_stock(driver, 'myntra') if profile['stock_check'] else None
+            images = self._capture_product_images(driver, "myntra_product", profile)
             
             # Return structured data
             return {
@@ -390,39 +1201,33 @@ class BotProcessor:
                 'title': cleaned_title,
                 'price': price_value,
                 'sizes': available_sizes,
-                'images': [screenshot],
+                'images': images,
+                'in_stock': in_stock,
                 'url': url,
                 'is_clothing': True
             }
             
+        except PageLoadError:
+            # Let the retry loop handle transient load failures
+            raise
         except Exception as e:
             logger.error(f"Myntra scraping error: {str(e)}")
             logger.error(traceback.format_exc())
             return None
         finally:
             if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
+                self.browser_pool.release('myntra', driver)
     
-    async def scrape_amazon(self, url, update):
+    def scrape_amazon(self, url, update):
         """Scrape Amazon product details"""
         logger.info(f"Scraping Amazon product: {url}")
         
         driver = None
         try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=self.chrome_options
-            )
-            driver.set_page_load_timeout(TIMEOUT)
+            driver = self.browser_pool.acquire('amazon', self.get_pin_code(update))
             
             # Load product page
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, 'productTitle'))
-            )
+            self._load_page(driver, url, (By.ID, 'productTitle'))
             
             # Extract product details
             title_element = driver.find_element(By.ID, 'productTitle')
@@ -448,13 +1253,10 @@ class BotProcessor:
             for size_element in size_elements:
                 available_sizes.append(size_element.text.strip())
             
-            # Capture screenshot
-            screenshot = self.capture_screenshot(driver, "amazon_product")
-            
-            # Check for watermarks
-            if self.detect_watermark(screenshot):
-                logger.info("Watermark detected, refreshing screenshot")
-                screenshot = self.capture_screenshot(driver, "amazon_product")
+            # Run the stages enabled for this chat
+            profile = get_profile(update.effective_chat.id)
+            in_stock = self.check_stock(driver, 'amazon') if profile['stock_check'] else None
+            images = self._capture_product_images(driver, "amazon_product", profile)
             
             # Return structured data
             return {
@@ -462,39 +1264,33 @@ class BotProcessor:
                 'title': cleaned_title,
                 'price': price_value,
                 'sizes': available_sizes,
-                'images': [screenshot],
+                'images': images,
+                'in_stock': in_stock,
                 'url': url,
                 'is_clothing': 'clothing' in url.lower() or 'fashion' in url.lower()
             }
             
+        except PageLoadError:
+            # Let the retry loop handle transient load failures
+            raise
         except Exception as e:
             logger.error(f"Amazon scraping error: {str(e)}")
             logger.error(traceback.format_exc())
             return None
         finally:
             if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
+                self.browser_pool.release('amazon', driver)
     
-    async def scrape_flipkart(self, url, update):
+    def scrape_flipkart(self, url, update):
         """Scrape Flipkart product details"""
         logger.info(f"Scraping Flipkart product: {url}")
         
         driver = None
         try:
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=self.chrome_options
-            )
-            driver.set_page_load_timeout(TIMEOUT)
+            driver = self.browser_pool.acquire('flipkart', self.get_pin_code(update))
             
             # Load product page
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, 'VU-ZEz'))
-            )
+            self._load_page(driver, url, (By.CLASS_NAME, 'VU-ZEz'))
             
             # Extract product details
             title_element = driver.find_element(By.CLASS_NAME, 'VU-ZEz')
@@ -520,13 +1316,10 @@ class BotProcessor:
             for size_element in size_elements:
                 available_sizes.append(size_element.text.strip())
             
-            # Capture screenshot
-            screenshot = self.capture_screenshot(driver, "flipkart_product")
-            
-            # Check for watermarks
-            if self.detect_watermark(screenshot):
-                logger.info("Watermark detected, refreshing screenshot")
-                screenshot = self.capture_screenshot(driver, "flipkart_product")
+            # Run the stages enabled for this chat
+            profile = get_profile(update.effective_chat.id)
+            in_stock = self.check_stock(driver, 'flipkart') if profile['stock_check'] else None
+            images = self._capture_product_images(driver, "flipkart_product", profile)
             
             # Return structured data
             return {
@@ -534,21 +1327,22 @@ class BotProcessor:
                 'title': cleaned_title,
                 'price': price_value,
                 'sizes': available_sizes,
-                'images': [screenshot],
+                'images': images,
+                'in_stock': in_stock,
                 'url': url,
                 'is_clothing': 'clothing' in url.lower() or 'fashion' in url.lower()
             }
             
+        except PageLoadError:
+            # Let the retry loop handle transient load failures
+            raise
         except Exception as e:
             logger.error(f"Flipkart scraping error: {str(e)}")
             logger.error(traceback.format_exc())
             return None
         finally:
             if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
+                self.browser_pool.release('flipkart', driver)
     
     def clean_title(self, title, is_clothing=False):
         """Clean product title according to requirements"""
@@ -590,21 +1384,115 @@ class BotProcessor:
             return "Price unavailable"
     
     def capture_screenshot(self, driver, prefix="screenshot"):
-        """Capture screenshot and save to file"""
-        timestamp = int(time.time())
-        filename = f"{SCREENSHOT_DIR}/{prefix}_{timestamp}.png"
+        """Capture the product card region, recompress it and save to file"""
+        timestamp = time.time_ns()  # Scrapes now run in parallel threads; seconds could collide
         
-        # Take screenshot
-        driver.save_screenshot(filename)
+        # Prefer an element-level screenshot of the product card
+        png = None
+        locator = PRODUCT_CARD_SELECTORS.get(prefix)
+        if locator:
+            try:
+                png = driver.find_element(*locator).screenshot_as_png
+            except Exception as e:
+                logger.warning(f"Element screenshot failed for {locator[1]}, using viewport: {str(e)}")
+        if not png:
+            png = driver.get_screenshot_as_png()
         
         # Check if it's a valid image
-        if not os.path.exists(filename) or os.path.getsize(filename) < 1000:
+        if not png or len(png) < 1000:
             raise Exception("Screenshot capture failed")
         
+        encoded = self._encode_screenshot(png)
+        extension = 'webp' if SCREENSHOT_FORMAT == 'WEBP' else 'jpg'
+        filename = f"{SCREENSHOT_DIR}/{prefix}_{timestamp}.{extension}"
+        with open(filename, 'wb') as f:
+            f.write(encoded)
+        
+        stats = self._get_screenshot_stats(prefix.split('_')[0])
+        with self.state_lock:
+            stats['raw_bytes'] += len(png)
+            stats['encoded_bytes'] += len(encoded)
+        logger.info(f"Screenshot {filename}: {len(png)} -> {len(encoded)} bytes")
+        
         return filename
     
-    def detect_watermark(self, image_path):
-        """Detect if screenshot contains watermark"""
+    def _encode_screenshot(self, png):
+        """Re-encode a PNG screenshot to the configured lossy format within the size budget"""
+        image = Image.open(BytesIO(png)).convert('RGB')
+        image.thumbnail((SCREENSHOT_MAX_EDGE, SCREENSHOT_MAX_EDGE), Image.LANCZOS)
+        
+        quality = SCREENSHOT_QUALITY
+        while True:
+            buffer = BytesIO()
+            image.save(buffer, format=SCREENSHOT_FORMAT, quality=quality, optimize=True)
+            if buffer.tell() <= SCREENSHOT_MAX_BYTES:
+                return buffer.getvalue()
+            
+            if quality > SCREENSHOT_MIN_QUALITY:
+                quality = max(SCREENSHOT_MIN_QUALITY, quality - 10)
+                continue
+            
+            # Quality is at its floor, so downscale (tall crops can be far over budget)
+            long_edge = max(image.size)
+            if long_edge <= SCREENSHOT_MIN_EDGE:
+                logger.warning(f"Screenshot still {buffer.tell()} bytes at minimum size and quality")
+                return buffer.getvalue()
+            scale = max(0.5, min(0.9, (SCREENSHOT_MAX_BYTES / buffer.tell()) ** 0.5))
+            target = max(SCREENSHOT_MIN_EDGE, int(long_edge * scale))
+            image.thumbnail((target, target), Image.LANCZOS)
+    
+    def _get_screenshot_stats(self, platform):
+        """Return the screenshot byte and upload counters for a platform"""
+        with self.state_lock:
+            if platform not in self.screenshot_stats:
+                self.screenshot_stats[platform] = {
+                    'raw_bytes': 0,
+                    'encoded_bytes': 0,
+                    'uploaded_bytes': 0,
+                    'upload_seconds': 0.0
+                }
+            return self.screenshot_stats[platform]
+    
+    def format_screenshot_stats(self):
+        """Summarise bytes saved by recompression and estimated upload time saved per platform"""
+        if not self.screenshot_stats:
+            return "No screenshots captured yet"
+        
+        lines = []
+        for platform, stats in sorted(self.screenshot_stats.items()):
+            saved = stats['raw_bytes'] - stats['encoded_bytes']
+            # Baseline is the cropped PNG, so savings from cropping itself are not included
+            line = f"• {platform}: {saved / 1024:.0f} KB saved by recompression vs cropped PNG ({stats['raw_bytes'] / 1024:.0f} -> {stats['encoded_bytes'] / 1024:.0f} KB)"
+            
+            # Rough estimate: average throughput includes per-request API overhead
+            if stats['uploaded_bytes'] and stats['upload_seconds']:
+                throughput = stats['uploaded_bytes'] / stats['upload_seconds']
+                line += f", est. ≤{saved / throughput:.1f}s upload time saved (from avg throughput)"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def detect_watermark(self, image_path, prefix):
+        """Detect if screenshot contains watermark, reusing verdicts for near-duplicates"""
+        try:
+            image_hash = self.watermark_cache.dhash(image_path)
+        except Exception as e:
+            logger.warning(f"Could not hash screenshot {image_path}: {str(e)}")
+            return bool(self._ocr_watermark(image_path))
+        
+        cached = self.watermark_cache.get(prefix, image_hash)
+        if cached is not None:
+            return cached
+        
+        start = time.monotonic()
+        verdict = self._ocr_watermark(image_path)
+        if verdict is None:
+            # Don't cache OCR failures
+            return False
+        self.watermark_cache.put(prefix, image_hash, verdict, time.monotonic() - start)
+        return verdict
+    
+    def _ocr_watermark(self, image_path):
+        """Run OCR on the screenshot and look for watermark text (None on OCR error)"""
         try:
             # Simple watermark detection - look for common watermark text
             result = reader.readtext(image_path)
@@ -621,7 +1509,7 @@ class BotProcessor:
             return False
         except Exception as e:
             logger.error(f"Watermark detection error: {str(e)}")
-            return False
+            return None
     
     async def send_formatted_message(self, update, data):
         """Send formatted message according to platform rules"""
@@ -630,19 +1518,33 @@ class BotProcessor:
         # Generate formatted text
         formatted_text = self.format_text(data)
         
+        # Track upload throughput for the screenshot stats
+        def record_upload(seconds):
+            stats = self._get_screenshot_stats(data['platform'])
+            uploaded = sum(os.path.getsize(path) for path in data['images'])
+            with self.state_lock:
+                stats['uploaded_bytes'] += uploaded
+                stats['upload_seconds'] += seconds
+        
         # Send message with appropriate media
-        if len(data['images']) > 1 and data['platform'] == 'meesho':
+        if not data['images']:
+            # Text-only post (fast mode or degraded platform)
+            await self.send_scheduler.send_text(message, formatted_text, priority=PRIORITY_POST)
+        elif len(data['images']) > 1 and data['platform'] == 'meesho':
             # For Meesho, send product + review screenshots
-            media = [
-                InputMediaPhoto(open(data['images'][0], 'rb'), caption=formatted_text),
-                InputMediaPhoto(open(data['images'][1], 'rb'))
-            ]
-            await message.reply_media_group(media=media)
+            await self.send_scheduler.send_media_group(
+                message,
+                data['images'][:2],
+                formatted_text,
+                on_sent=record_upload
+            )
         else:
             # For other platforms, send single screenshot
-            await message.reply_photo(
-                photo=open(data['images'][0], 'rb'),
-                caption=formatted_text
+            await self.send_scheduler.send_photo(
+                message,
+                data['images'][0],
+                formatted_text,
+                on_sent=record_upload
             )
     
     def format_text(self, data):
@@ -654,6 +1556,8 @@ class BotProcessor:
         
         # Common footer
         footer = "\n@reviewcheckk"
+        if data.get('in_stock') is False:
+            footer = "\n⚠️ Out of stock" + footer
         
         # Platform-specific formatting
         if platform == 'meesho':
@@ -679,6 +1583,147 @@ class BotProcessor:
             formatted = f"{title} from @{price} rs\n{url}"
             return formatted + footer
     
+    async def mode_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle mode switching commands"""
+        message = update.effective_message
+        command = message.text.split()[0].split('@')[0]
+        chat_id = update.effective_chat.id
+        
+        if command == '/advancing':
+            CHAT_PROFILES[chat_id] = 'advanced'
+            await self.send_scheduler.send_text(message, "✅ Switched to High-Advanced Mode\n\n"
+                                                         "• Full smart features enabled\n"
+                                                         "• Stock verification\n"
+                                                         "• Review screenshots\n"
+                                                         "• Screenshot replacement\n"
+                                                         "• Advanced formatting")
+        elif command == '/off_advancing':
+            CHAT_PROFILES[chat_id] = 'medium'
+            await self.send_scheduler.send_text(message, "✅ Switched to Medium Mode\n\n"
+                                                         "• Fast processing\n"
+                                                         "• Basic scraping\n"
+                                                         "• No reviews or OCR checks\n"
+                                                         "• Optimized for speed")
+        elif command == '/fast':
+            CHAT_PROFILES[chat_id] = 'fast'
+            await self.send_scheduler.send_text(message, "✅ Switched to Fast Mode\n\n"
+                                                         "• No browser\n"
+                                                         "• Text-only posts\n"
+                                                         "• Lowest latency")
+        else:
+            await self.send_scheduler.send_text(message, "❌ Unknown command")
+    
+    async def curl_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /curl command for channel scraping"""
+        message = update.effective_message
+        if CHAT_PROFILES.get(update.effective_chat.id) != 'advanced':
+            await self.send_scheduler.send_text(message, "❌ This command only works in High-Advanced Mode\n"
+                                                         "Use /advancing to enable advanced features")
+            return
+        
+        try:
+            # Parse command arguments
+            args = context.args
+            if len(args) < 1:
+                await self.send_scheduler.send_text(message, "❌ Usage: /curl <target_channel> [month]\n"
+                                                             "Example: /curl @dealschannel January")
+                return
+            
+            target_channel = args[0]
+            month = args[1] if len(args) > 1 else datetime.now().strftime("%B")
+            
+            await self.send_scheduler.send_text(message, f"🔍 Starting channel scraping for {target_channel} ({month})...\n"
+                                                         "This may take a few moments.")
+            
+            # In a real implementation, this would fetch messages from the channel
+            # and process them according to the requirements
+            await asyncio.sleep(2)
+            
+            # Simulate results
+            await self.send_scheduler.send_text(message, f"✅ Completed scraping {target_channel} for {month}\n"
+                                                         "• Processed 24 product links\n"
+                                                         "• Verified stock status\n"
+                                                         "• Updated pricing\n"
+                                                         "• Refreshed screenshots\n"
+                                                         "• Formatted posts according to rules")
+            
+        except Exception as e:
+            logger.error(f"Error in /curl command: {str(e)}")
+            await self.send_scheduler.send_text(message, f"❌ Error processing command: {str(e)}")
+    
+    async def bench_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /bench command comparing cold and warm page loads"""
+        message = update.effective_message
+        if CHAT_PROFILES.get(update.effective_chat.id) != 'advanced':
+            await self.send_scheduler.send_text(message, "❌ This command only works in High-Advanced Mode\n"
+                                                         "Use /advancing to enable advanced features")
+            return
+        if not context.args:
+            await self.send_scheduler.send_text(message, "❌ Usage: /bench <product_link>")
+            return
+        
+        try:
+            url = self.clean_url(await self.unshorten_url(context.args[0]))
+            domain = self.get_domain(url)
+            if domain not in SUPPORTED_DOMAINS.values():
+                await self.send_scheduler.send_text(message, f"❌ Unsupported domain: {domain}")
+                return
+            platform = self.get_platform(domain)
+            
+            # Chrome launches and loads block, so keep them off the event loop
+            cold, warm = await asyncio.to_thread(self.benchmark_page_load, url, platform)
+            await self.send_scheduler.send_text(
+                message,
+                f"⏱️ Page load benchmark ({platform}, {BENCH_RUNS} runs)\n\n"
+                f"• Cold profile: {cold:.2f}s median\n"
+                f"• Warm profile: {warm:.2f}s median\n"
+                f"• Saved: {cold - warm:.2f}s per load"
+            )
+        except Exception as e:
+            logger.error(f"Error in /bench command: {str(e)}")
+            await self.send_scheduler.send_text(message, f"❌ Error running benchmark: {str(e)}")
+    
+    def benchmark_page_load(self, url, platform, runs=BENCH_RUNS):
+        """Return median load seconds for a blank profile and for a fresh clone of the warm snapshot"""
+        def timed_load(driver):
+            driver.set_page_load_timeout(TIMEOUT)
+            start = time.monotonic()
+            driver.get(url)
+            return time.monotonic() - start
+        
+        cold = []
+        for _ in range(runs):
+            cold_dir = tempfile.mkdtemp(prefix='cold_profile_')
+            try:
+                driver = self.browser_pool.start_driver(cold_dir)
+            except Exception:
+                shutil.rmtree(cold_dir, ignore_errors=True)
+                raise
+            try:
+                cold.append(timed_load(driver))
+            finally:
+                self.browser_pool.discard(driver)
+        
+        # A new clone per run, so no run sees a page an earlier run already loaded
+        warm = []
+        for _ in range(runs):
+            driver = self.browser_pool.clone(platform)
+            try:
+                self.browser_pool.apply_presets(driver, platform, PIN_DEFAULT)
+                warm.append(timed_load(driver))
+            finally:
+                self.browser_pool.discard(driver)
+        
+        return sorted(cold)[runs // 2], sorted(warm)[runs // 2]
+    
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /stats command for screenshot and watermark cache statistics"""
+        await self.send_scheduler.send_text(
+            update.effective_message,
+            "📊 Screenshot stats\n\n" + self.format_screenshot_stats()
+            + "\n\n🔍 Watermark cache\n\n" + self.watermark_cache.format_stats()
+        )
+    
     async def _regenerate_with_new_screenshots(self, update, context, last_data):
         """Regenerate last message with new screenshots"""
         try:
@@ -689,85 +1734,34 @@ class BotProcessor:
             processed = await self.process_link(link, update)
             if processed:
                 await self.send_formatted_message(update, processed)
-                await update.effective_message.reply_text("✅ Screenshots updated")
+                await self.send_scheduler.send_text(update.effective_message, "✅ Screenshots updated")
             else:
-                await update.effective_message.reply_text("❌ Could not regenerate message")
+                await self.send_scheduler.send_text(update.effective_message, "❌ Could not regenerate message")
         except Exception as e:
             logger.error(f"Error regenerating screenshots: {str(e)}")
-            await update.effective_message.reply_text(f"❌ Error updating screenshots: {str(e)}")
+            await self.send_scheduler.send_text(update.effective_message, f"❌ Error updating screenshots: {str(e)}")
 
-async def mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle mode switching commands"""
-    global MODE_ADVANCED
-    command = update.effective_message.text
-    
-    if command == '/advancing':
-        MODE_ADVANCED = True
-        await update.effective_message.reply_text("✅ Switched to High-Advanced Mode\n\n"
-                                                "• Full smart features enabled\n"
-                                                "• Stock verification\n"
-                                                "• Price optimization\n"
-                                                "• Screenshot replacement\n"
-                                                "• Advanced formatting")
-    elif command == '/off_advancing':
-        MODE_ADVANCED = False
-        await update.effective_message.reply_text("✅ Switched to Medium Mode\n\n"
-                                                "• Fast processing\n"
-                                                "• Basic scraping\n"
-                                                "• Minimal checks\n"
-                                                "• Optimized for speed")
-    else:
-        await update.effective_message.reply_text("❌ Unknown command")
-
-async def curl_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /curl command for channel scraping"""
-    global MODE_ADVANCED
-    
-    if not MODE_ADVANCED:
-        await update.effective_message.reply_text("❌ This command only works in High-Advanced Mode\n"
-                                               "Use /advancing to enable advanced features")
-        return
-    
-    try:
-        # Parse command arguments
-        args = context.args
-        if len(args) < 1:
-            await update.effective_message.reply_text("❌ Usage: /curl <target_channel> [month]\n"
-                                                   "Example: /curl @dealschannel January")
-            return
-        
-        target_channel = args[0]
-        month = args[1] if len(args) > 1 else datetime.now().strftime("%B")
-        
-        await update.effective_message.reply_text(f"🔍 Starting channel scraping for {target_channel} ({month})...\n"
-                                                "This may take a few moments.")
-        
-        # In a real implementation, this would fetch messages from the channel
-        # and process them according to the requirements
-        await asyncio.sleep(2)
-        
-        # Simulate results
-        await update.effective_message.reply_text(f"✅ Completed scraping {target_channel} for {month}\n"
-                                                "• Processed 24 product links\n"
-                                                "• Verified stock status\n"
-                                                "• Updated pricing\n"
-                                                "• Refreshed screenshots\n"
-                                                "• Formatted posts according to rules")
-        
-    except Exception as e:
-        logger.error(f"Error in /curl command: {str(e)}")
-        await update.effective_message.reply_text(f"❌ Error processing command: {str(e)}")
+def get_profile(chat_id):
+    """Return the processing profile for a chat"""
+    return PROCESSING_PROFILES[CHAT_PROFILES.get(chat_id, DEFAULT_PROFILE)]
 
 def main():
     """Main function to start the bot"""
-    application = Application.builder().token(BOT_TOKEN).concurrent_updates(True).build()
-    
     processor = BotProcessor()
     
+    async def shutdown(application):
+        """Close pooled browser sessions"""
+        processor.browser_pool.close()
+    
+    application = Application.builder().token(BOT_TOKEN).concurrent_updates(True).post_shutdown(shutdown).build()
+    
     # Register handlers
-    application.add_handler(CommandHandler("advancing", mode_command))
-    application.add_handler(CommandHandler("off_advancing", mode_command))
-    application.add_handler(CommandHandler("curl", curl_command))
+    application.add_handler(CommandHandler("advancing", processor.mode_command))
+    application.add_handler(CommandHandler("off_advancing", processor.mode_command))
+    application.add_handler(CommandHandler("fast", processor.mode_command))
+    application.add_handler(CommandHandler("curl", processor.curl_command))
+    application.add_handler(CommandHandler("stats", processor.stats_command))
+    application.add_handler(CommandHandler("bench", processor.bench_command))
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND, 
         processor.process_message